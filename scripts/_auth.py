@@ -0,0 +1,15 @@
+"""Shared Azure credential and project client for the helper scripts."""
+from __future__ import annotations
+
+import functools
+
+from azure.identity import DefaultAzureCredential
+from azure.ai.projects import AIProjectClient
+
+# One credential per process so every client shares its token cache.
+CREDENTIAL = DefaultAzureCredential()
+
+
+@functools.lru_cache(maxsize=4)
+def get_project_client(endpoint: str) -> AIProjectClient:
+    return AIProjectClient(endpoint=endpoint, credential=CREDENTIAL)
@@ -0,0 +1,30 @@
+"""Helpers for locating the active azd environment."""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+
+def detect_azd_env_name() -> Optional[str]:
+    explicit = os.getenv("AZURE_ENV_NAME")
+    if explicit:
+        return explicit
+
+    config_path = Path(".azure") / "config.json"
+    if not config_path.exists():
+        return None
+    try:
+        with config_path.open("r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return None
+    candidates = []
+    defaults = data.get("defaults", {})
+    candidates.append(defaults.get("environment"))
+    candidates.append(data.get("defaultEnvironment"))
+    for candidate in candidates:
+        if isinstance(candidate, str) and candidate:
+            return candidate
+    return None
@@ -1,32 +1,102 @@
+import itertools
 import os
 import socket
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
 from urllib.parse import urlparse
 
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
 from azure.ai.agents.models import ConnectedAgentTool
 
+from _auth import get_project_client
+from _azd import detect_azd_env_name
+
 endpoint = os.environ["AIFOUNDRY_PROJECT_ENDPOINT"]
 default_host = os.environ.get("AIFOUNDRY_ACCOUNT_HOST")
 agent_model = os.getenv("AIFOUNDRY_AGENT_MODEL", "gpt-4o").strip() or "gpt-4o"
-credential = DefaultAzureCredential()
-project_client = AIProjectClient(endpoint=endpoint, credential=credential)
+project_client = get_project_client(endpoint)
 agents_client = project_client.agents
 
-def wait_for_dns(host: str, timeout: int = 900, interval: int = 10) -> None:
+def wait_for_dns(
+    host: str,
+    timeout: int = 900,
+    max_backoff: float = 30.0,
+    stop: Optional[threading.Event] = None,
+) -> str:
     deadline = time.time() + timeout
-    while time.time() < deadline:
+    backoff = 1.0
+    stop = stop or threading.Event()
+    while time.time() < deadline and not stop.is_set():
         try:
-            socket.gethostbyname(host)
-            return
+            # getaddrinfo covers both A and AAAA records, so IPv6-only answers still count.
+            socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+            return host
         except socket.gaierror:
             print(f"Waiting for DNS propagation for {host}...", flush=True)
-            time.sleep(interval)
+            stop.wait(max(0.0, min(max_backoff, backoff, deadline - time.time())))
+            backoff *= 1.5
+    if stop.is_set():
+        raise RuntimeError(f"Stopped waiting for DNS name {host}.")
     raise RuntimeError(f"DNS name {host} did not resolve within {timeout} seconds.")
 
 
+def wait_for_preferred_dns(hosts: list[str], timeout: int = 900) -> str:
+    """Resolve hosts concurrently, preferring them in order.
+
+    A later host is only returned once every earlier host has failed, so a fast-resolving
+    fallback never short-circuits the wait for the primary host. Because all hosts are polled
+    in parallel, falling back no longer costs a second full timeout.
+    """
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(hosts))
+    try:
+        futures = [executor.submit(wait_for_dns, host, timeout, stop=stop) for host in hosts]
+        errors = []
+        for future in futures:
+            try:
+                return future.result()
+            except RuntimeError as exc:
+                errors.append(exc)
+        # Every host timed out; surface the primary host's error.
+        raise errors[0]
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _azd_env_file() -> Optional[Path]:
+    env_name = detect_azd_env_name()
+    if not env_name:
+        return None
+    env_file = Path(".azure") / env_name / ".env"
+    return env_file if env_file.exists() else None
+
+
+def store_azd_env_values(values: Dict[str, str]) -> None:
+    """Persist values into the active azd environment with a single file write."""
+    env_file = _azd_env_file()
+    if env_file is None:
+        # No local azd environment to edit; let the CLI locate it instead.
+        for key, value in values.items():
+            subprocess.run(["azd", "env", "set", key, value], check=False)
+        return
+
+    lines = []
+    for line in env_file.read_text(encoding="utf-8").splitlines():
+        key = line.split("=", 1)[0].strip()
+        if key not in values:
+            lines.append(line)
+    lines.extend(f'{key}="{value}"' for key, value in values.items())
+
+    temp_file = env_file.with_name(env_file.name + ".tmp")
+    temp_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(temp_file, env_file)
+    print(f"Stored agent ids in {env_file}")
+
+
 parsed = urlparse(endpoint)
 if not parsed.hostname:
     raise ValueError(f"Invalid project endpoint: {endpoint}")
@@ -46,26 +116,29 @@ try:
 except ValueError:
     dns_timeout = 900
 
-try:
-    wait_for_dns(bootstrap_host, timeout=dns_timeout)
-except RuntimeError:
-    if fallback_host:
-        wait_for_dns(fallback_host, timeout=dns_timeout)
-    else:
-        raise
+candidates = [bootstrap_host] + ([fallback_host] if fallback_host else [])
+resolved_host = wait_for_preferred_dns(candidates, timeout=dns_timeout)
+print(f"DNS resolved for {resolved_host}.")
 
 print(f"Provisioning agents with model: {agent_model}")
 
 print("Creating specialist agents...")
-priority = agents_client.create_agent(
-    model=agent_model, name="priority", instructions="Return High/Medium/Low"
-)
-team = agents_client.create_agent(
-    model=agent_model, name="team", instructions="Assign Frontend/Backend/Infra/Marketing"
-)
-effort = agents_client.create_agent(
-    model=agent_model, name="effort", instructions="Estimate Small/Medium/Large"
-)
+specialist_specs = [
+    ("priority", "Return High/Medium/Low"),
+    ("team", "Assign Frontend/Backend/Infra/Marketing"),
+    ("effort", "Estimate Small/Medium/Large"),
+]
+# Each create_agent call is an independent control-plane round-trip, so issue them together.
+with ThreadPoolExecutor(max_workers=len(specialist_specs)) as executor:
+    specialist_futures = {
+        name: executor.submit(
+            agents_client.create_agent, model=agent_model, name=name, instructions=instructions
+        )
+        for name, instructions in specialist_specs
+    }
+priority = specialist_futures["priority"].result()
+team = specialist_futures["team"].result()
+effort = specialist_futures["effort"].result()
 
 print("PRIORITY_AGENT_ID:", priority.id)
 print("TEAM_AGENT_ID:", team.id)
@@ -89,18 +162,24 @@ connected_tools = [
     ),
 ]
 
-print("Creating triage agent...")
+tool_definitions = list(itertools.chain.from_iterable(tool.definitions for tool in connected_tools))
+
+print(f"Creating triage agent with {len(tool_definitions)} connected agent tools...")
 triage = agents_client.create_agent(
     model=agent_model,
     name="triage",
     instructions="Coordinate priority, team, and effort via connected agents.",
-    tools=[definition for tool in connected_tools for definition in tool.definitions],
+    tools=tool_definitions,
 )
 
 print("TRIAGE_AGENT_ID:", triage.id)
 
 # Store in azd env
-subprocess.run(["azd", "env", "set", "TRIAGE_AGENT_ID", triage.id], check=False)
-subprocess.run(["azd", "env", "set", "PRIORITY_AGENT_ID", priority.id], check=False)
-subprocess.run(["azd", "env", "set", "TEAM_AGENT_ID", team.id], check=False)
-subprocess.run(["azd", "env", "set", "EFFORT_AGENT_ID", effort.id], check=False)
+store_azd_env_values(
+    {
+        "TRIAGE_AGENT_ID": triage.id,
+        "PRIORITY_AGENT_ID": priority.id,
+        "TEAM_AGENT_ID": team.id,
+        "EFFORT_AGENT_ID": effort.id,
+    }
+)
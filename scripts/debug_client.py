@@ -1,9 +1,8 @@
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
+from _auth import get_project_client
 
 endpoint = "https://mafmbsqhfm5yfmu4ewmfky26tkhuksub.services.ai.azure.com/api/projects/mafmbsqhfm5yfmu4ewmfky26tkhukproj"
 
-client = AIProjectClient(endpoint=endpoint, credential=DefaultAzureCredential())
+client = get_project_client(endpoint)
 print("client created")
 print("agents:", list(client.agents.list_agents()))
 thread = client.agents.threads.create()
@@ -1,16 +1,20 @@
-import json
 import os
+import shutil
 import subprocess
 import sys
 from typing import List
 
 
+# Resolve the az executable once (az.cmd on Windows). Windows still runs .cmd files through
+# cmd.exe; passing an argument list just avoids hand-joining and quoting the command line.
+_AZ = shutil.which("az") or shutil.which("az.cmd") or "az"
+
+
 def run_command(command: List[str]) -> subprocess.CompletedProcess:
     """Execute a command and return the completed process."""
-    if os.name == "nt":
-        joined = " ".join(command)
-        return subprocess.run(joined, capture_output=True, text=True, shell=True)
-    return subprocess.run(command, capture_output=True, text=True)
+    if command and command[0] == "az":
+        command = [_AZ, *command[1:]]
+    return subprocess.run(command, capture_output=True, text=True, shell=False)
 
 
 def ensure_resource_group() -> None:
@@ -18,7 +22,8 @@ def ensure_resource_group() -> None:
     subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
     location = os.getenv("AZURE_LOCATION") or "westus3"
 
-    show_cmd = ["az", "group", "show", "--name", resource_group]
+    # Only the exit code matters here, so suppress the JSON body.
+    show_cmd = ["az", "group", "show", "--name", resource_group, "--output", "none"]
     if subscription_id:
         show_cmd.extend(["--subscription", subscription_id])
 
@@ -30,7 +35,13 @@ def ensure_resource_group() -> None:
         return
 
     print(f"Resource group '{resource_group}' not found. Creating in location '{location}'.")
-    create_cmd = ["az", "group", "create", "--name", resource_group, "--location", location]
+    create_cmd = [
+        "az", "group", "create",
+        "--name", resource_group,
+        "--location", location,
+        "--query", "properties.provisioningState",
+        "--output", "tsv",
+    ]
     if subscription_id:
         create_cmd.extend(["--subscription", subscription_id])
 
@@ -39,12 +50,7 @@ def ensure_resource_group() -> None:
         sys.stderr.write(create_result.stderr)
         raise SystemExit(create_result.returncode)
 
-    try:
-        details = json.loads(create_result.stdout or "{}")
-    except json.JSONDecodeError:
-        details = {}
-
-    if details.get("properties", {}).get("provisioningState") == "Succeeded":
+    if create_result.stdout.strip() == "Succeeded":
         print(f"Resource group '{resource_group}' created successfully.")
     else:
         print(f"Resource group '{resource_group}' ensured (status unknown).")
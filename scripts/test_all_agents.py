@@ -1,14 +1,27 @@
 import argparse
-import json
+import hashlib
 import os
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
+from _auth import get_project_client
+from _azd import detect_azd_env_name
 from verify_agent import (
     verify_agent as run_agent_verification,
     _iter_thread_messages,
 )
 
+# Bump whenever _parse_env_file changes so stale cached parses are ignored.
+_ENV_CACHE_VERSION = 2
+_ENV_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "azd-multiagent" / "env"
+
+# Same key rules as a line-by-line split on the first "=": anything not starting with "#".
+_ENV_LINE_RE = re.compile(r"^[ \t]*([^#\s=][^=\n]*?)[ \t]*=(.*)$", re.MULTILINE)
+_AGENT_LINE_RE = re.compile(r"MessageRole\.AGENT|^\[assistant\]", re.IGNORECASE)
+
 
 def _strip_quotes(value: str) -> str:
     value = value.strip()
@@ -17,54 +30,59 @@ def _strip_quotes(value: str) -> str:
     return value
 
 
+def _parse_env_file(path: Path) -> Dict[str, str]:
+    # Comment and blank lines never match the KEY=value pattern, so they are skipped implicitly.
+    text = path.read_text(encoding="utf-8")
+    return {match.group(1): _strip_quotes(match.group(2)) for match in _ENV_LINE_RE.finditer(text)}
+
+
+def _env_cache_path(path: Path) -> Path:
+    # Keep cached values (which may include secrets) out of the working tree.
+    digest = hashlib.sha256(str(path.resolve()).encode("utf-8")).hexdigest()
+    return _ENV_CACHE_DIR / f"{digest}.pickle"
+
+
+def _read_env_file_cached(path: Path) -> Dict[str, str]:
+    # Parsed values are reused while the env file's mtime, size and inode and the parser version
+    # are unchanged; size and inode catch rewrites within one coarse mtime tick.
+    cache_path = _env_cache_path(path)
+    stat = path.stat()
+    file_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    try:
+        with cache_path.open("rb") as handle:
+            cached = pickle.load(handle)
+        if cached.get("version") == _ENV_CACHE_VERSION and cached.get("file_key") == file_key:
+            return cached["vars"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+        pass
+
+    parsed = _parse_env_file(path)
+    try:
+        _ENV_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump({"version": _ENV_CACHE_VERSION, "file_key": file_key, "vars": parsed}, handle)
+    except OSError:
+        pass
+    return parsed
+
+
 def _load_env_file(path: Path) -> None:
     if not path.exists():
         return
     print(f"Loading environment values from {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        for raw_line in handle:
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = _strip_quotes(value)
-            existing = os.environ.get(key)
-            if existing and existing != value:
-                print(f"Overriding environment variable {key} (was '{existing}', now '{value}')")
-            os.environ[key] = value
-
-
-def _detect_azd_env_name() -> Optional[str]:
-    explicit = os.getenv("AZURE_ENV_NAME")
-    if explicit:
-        return explicit
-
-    config_path = Path(".azure") / "config.json"
-    if not config_path.exists():
-        return None
-    try:
-        with config_path.open("r", encoding="utf-8") as handle:
-            data = json.load(handle)
-    except (OSError, json.JSONDecodeError):
-        return None
-    candidates = []
-    defaults = data.get("defaults", {})
-    candidates.append(defaults.get("environment"))
-    candidates.append(data.get("defaultEnvironment"))
-    for candidate in candidates:
-        if isinstance(candidate, str) and candidate:
-            return candidate
-    return None
+    for key, value in _read_env_file_cached(path).items():
+        existing = os.environ.get(key)
+        if existing and existing != value:
+            print(f"Overriding environment variable {key} (was '{existing}', now '{value}')")
+        os.environ[key] = value
 
 
 def _initialize_env(explicit_path: Optional[str]) -> None:
     candidates = []
     if explicit_path:
         candidates.append(Path(explicit_path))
-    azure_env = _detect_azd_env_name()
+    azure_env = detect_azd_env_name()
     if azure_env:
         candidates.append(Path(".azure") / azure_env / ".env")
     candidates.append(Path(".env"))
@@ -91,12 +109,17 @@ def _require_env(name: str) -> str:
     return value.strip()
 
 
-def _extract_agent_lines(transcript: List[str]) -> List[str]:
+def _extract_agent_lines(transcript: Iterable[str]) -> List[str]:
     agent_lines: List[str] = []
+    # Non-agent lines are only kept as a fallback until the first agent line shows up.
+    other_lines: List[str] = []
     for line in transcript:
-        if "MessageRole.AGENT" in line or line.lower().startswith("[assistant]"):
+        if _AGENT_LINE_RE.search(line):
             agent_lines.append(line)
-    return agent_lines or transcript
+            other_lines.clear()
+        elif not agent_lines:
+            other_lines.append(line)
+    return agent_lines or other_lines
 
 
 def test_agents(ticket: str, poll_interval: float, timeout: float, max_attempts: int, initial_backoff: float, max_backoff: float) -> Dict[str, List[str]]:
@@ -109,22 +132,38 @@ def test_agents(ticket: str, poll_interval: float, timeout: float, max_attempts:
         "triage": "TRIAGE_AGENT_ID",
     }
 
+    # Share one client (and its credential/token cache) across every agent run.
+    agents_client = get_project_client(endpoint).agents
+    agent_ids = {agent_name: _require_env(env_var) for agent_name, env_var in agent_env_map.items()}
     outputs: Dict[str, List[str]] = {}
 
-    for agent_name, env_var in agent_env_map.items():
-        agent_id = _require_env(env_var)
-        print(f"\nRunning {agent_name} agent ({agent_id})...")
-        result = run_agent_verification(
-            ticket=ticket,
-            poll_interval=poll_interval,
-            timeout=timeout,
-            max_attempts=max_attempts,
-            initial_backoff=initial_backoff,
-            max_backoff=max_backoff,
-            agent_id=agent_id,
-        )
-        transcript = list(_iter_thread_messages(endpoint=result["project_endpoint"], thread_id=result["thread_id"]))
-        outputs[agent_name] = _extract_agent_lines(transcript)
+    # Each agent gets its own thread and run, so the verifications are independent.
+    with ThreadPoolExecutor(max_workers=len(agent_ids)) as executor:
+        futures = {}
+        for agent_name, agent_id in agent_ids.items():
+            print(f"Starting {agent_name} agent ({agent_id})...")
+            futures[agent_name] = executor.submit(
+                run_agent_verification,
+                ticket=ticket,
+                poll_interval=poll_interval,
+                timeout=timeout,
+                max_attempts=max_attempts,
+                initial_backoff=initial_backoff,
+                max_backoff=max_backoff,
+                agent_id=agent_id,
+                agents_client=agents_client,
+                agent_name=agent_name,
+            )
+
+        for agent_name, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as exc:
+                print(f"[{agent_name}] verification failed: {exc}")
+                raise
+            print(f"[{agent_name}] run finished with status: {result['status']}")
+            transcript = _iter_thread_messages(agents_client=agents_client, thread_id=result["thread_id"])
+            outputs[agent_name] = _extract_agent_lines(transcript)
 
     return outputs
 
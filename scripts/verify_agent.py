@@ -4,27 +4,42 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import random
+import re
 import sys
 import time
 from typing import Iterable, Optional
 
-from azure.core.exceptions import HttpResponseError
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
+from azure.core.exceptions import HttpResponseError, ServiceResponseError
 
+from _auth import get_project_client
 
-SUCCESS_STATUSES = {
+
+SUCCESS_STATUSES = frozenset({
     "succeeded",
     "completed",
-}
+})
 
-TERMINAL_FAILURE_STATUSES = {
+TERMINAL_FAILURE_STATUSES = frozenset({
     "failed",
     "canceled",
-}
+})
 
 TERMINAL_STATUSES = SUCCESS_STATUSES | TERMINAL_FAILURE_STATUSES
 
+RATE_LIMIT_CODES = frozenset({
+    "429",
+    "rate_limit_exceeded",
+    "throttled",
+})
+
+MESSAGE_PAGE_SIZE = 50
+
+# Longest a run stream may stay silent before we switch to polling runs.get.
+STREAM_IDLE_SECONDS = 10.0
+
+_RATE_LIMIT_RE = re.compile(r"rate[_ ]?limit", re.IGNORECASE)
+
 
 def _require_env(name: str) -> str:
     value = os.getenv(name)
@@ -41,21 +56,20 @@ def _normalize_status(value: Optional[object]) -> Optional[str]:
         return None
     text = str(value)
     # Convert enum-like forms such as "RunStatus.IN_PROGRESS" to "in_progress"
-    if "." in text:
-        text = text.split(".")[-1]
-    return text.strip().lower()
+    _, sep, tail = text.rpartition(".")
+    return (tail if sep else text).strip().lower()
 
 
 def _is_retryable_rate_limit(error: Optional[object]) -> bool:
     if not error:
         return False
     if isinstance(error, dict):
-        code = str(error.get("code", "")).lower()
-        message = str(error.get("message", "")).lower()
-    else:
-        code = ""
-        message = str(error).lower()
-    return "rate_limit" in code or "rate limit" in message
+        # A well-known throttling code is definitive; skip scanning the message.
+        code = str(error.get("code", ""))
+        if code.lower() in RATE_LIMIT_CODES or _RATE_LIMIT_RE.search(code):
+            return True
+        return bool(_RATE_LIMIT_RE.search(str(error.get("message", ""))))
+    return bool(_RATE_LIMIT_RE.search(str(error)))
 
 
 def _serialize_error(error: Optional[object]) -> Optional[object]:
@@ -79,6 +93,92 @@ def _serialize_error(error: Optional[object]) -> Optional[object]:
     return str(error)
 
 
+def _wait_for_run(
+    agents_client, *, thread_id: str, run_id: str, poll_interval: float, timeout: float, log_prefix: str = ""
+):
+    deadline = time.time() + timeout
+    last_status: Optional[str] = None
+    while time.time() < deadline:
+        current_run = agents_client.runs.get(thread_id=thread_id, run_id=run_id)
+        last_status = _normalize_status(getattr(current_run, "status", None))
+        if last_status:
+            print(f"{log_prefix}status: {last_status}")
+        if last_status in TERMINAL_STATUSES:
+            return current_run
+        time.sleep(poll_interval)
+    raise TimeoutError(f"Timed out waiting for run {run_id} (last status: {last_status or 'unknown'}).")
+
+
+def _stream_run(
+    agents_client, *, thread_id: str, agent_id: str, poll_interval: float, timeout: float, log_prefix: str = ""
+):
+    """Start a run and follow its server-sent events until it reaches a terminal status.
+
+    Each socket read is bounded by an idle window of max(poll_interval, STREAM_IDLE_SECONDS),
+    capped at timeout. A stream that goes quiet falls back to polling for the remaining time, so
+    --timeout can be overshot by at most one idle window.
+    """
+    deadline = time.time() + timeout
+    idle_timeout = min(timeout, max(poll_interval, STREAM_IDLE_SECONDS))
+    last_run = None
+    last_status: Optional[str] = None
+    try:
+        with agents_client.runs.stream(
+            thread_id=thread_id, agent_id=agent_id, read_timeout=idle_timeout
+        ) as stream:
+            for _event_type, event_data, _ in stream:
+                if getattr(event_data, "object", None) == "thread.run":
+                    last_run = event_data
+                    last_status = _normalize_status(getattr(event_data, "status", None))
+                    if last_status:
+                        print(f"{log_prefix}status: {last_status}")
+                    if last_status in TERMINAL_STATUSES:
+                        return event_data
+                # Message and step deltas count against the deadline too.
+                if time.time() >= deadline:
+                    break
+    except ServiceResponseError:
+        # The stream went idle (or dropped); without a run id there is nothing to poll.
+        if last_run is None:
+            raise
+    if last_run is None:
+        raise RuntimeError("Run stream ended before the run was created.")
+    if time.time() >= deadline:
+        raise TimeoutError(f"Timed out waiting for run {last_run.id} (last status: {last_status or 'unknown'}).")
+    # The stream closed or went quiet without a terminal event; poll for the remainder.
+    return _wait_for_run(
+        agents_client,
+        thread_id=thread_id,
+        run_id=last_run.id,
+        poll_interval=poll_interval,
+        timeout=deadline - time.time(),
+        log_prefix=log_prefix,
+    )
+
+
+def _run_to_completion(
+    agents_client, *, thread_id: str, agent_id: str, poll_interval: float, timeout: float, log_prefix: str = ""
+):
+    if hasattr(agents_client.runs, "stream"):
+        return _stream_run(
+            agents_client,
+            thread_id=thread_id,
+            agent_id=agent_id,
+            poll_interval=poll_interval,
+            timeout=timeout,
+            log_prefix=log_prefix,
+        )
+    run = agents_client.runs.create(thread_id=thread_id, agent_id=agent_id)
+    return _wait_for_run(
+        agents_client,
+        thread_id=thread_id,
+        run_id=run.id,
+        poll_interval=poll_interval,
+        timeout=timeout,
+        log_prefix=log_prefix,
+    )
+
+
 def verify_agent(
     ticket: str,
     poll_interval: float,
@@ -87,26 +187,29 @@ def verify_agent(
     initial_backoff: float,
     max_backoff: float,
     agent_id: str,
+    agents_client=None,
+    agent_name: Optional[str] = None,
 ) -> dict:
     endpoint = _require_env("AIFOUNDRY_PROJECT_ENDPOINT")
+    # Tag output so interleaved logs from concurrent verifications stay attributable.
+    log_prefix = f"[{agent_name}] " if agent_name else ""
 
-    credential = DefaultAzureCredential()
-    project_client = AIProjectClient(endpoint=endpoint, credential=credential)
-    agents_client = project_client.agents
+    if agents_client is None:
+        agents_client = get_project_client(endpoint).agents
 
-    print(f"Using project endpoint: {endpoint!r}")
-    print(f"Using agent id: {agent_id}")
+    print(f"{log_prefix}Using project endpoint: {endpoint!r}")
+    print(f"{log_prefix}Using agent id: {agent_id}")
 
     try:
         thread = agents_client.threads.create()
     except Exception as exc:  # pragma: no cover - investigative logging
-        print(f"failed to create thread: {exc}", file=sys.stderr)
+        print(f"{log_prefix}failed to create thread: {exc}", file=sys.stderr)
         raise
 
     try:
         agents_client.messages.create(thread_id=thread.id, role="user", content=ticket)
     except Exception as exc:  # pragma: no cover - investigative logging
-        print(f"failed to create message: {exc}", file=sys.stderr)
+        print(f"{log_prefix}failed to create message: {exc}", file=sys.stderr)
         raise
 
     attempt = 1
@@ -115,43 +218,39 @@ def verify_agent(
 
     while attempt <= max_attempts:
         try:
-            run = agents_client.runs.create(thread_id=thread.id, agent_id=agent_id)
+            run = _run_to_completion(
+                agents_client,
+                thread_id=thread.id,
+                agent_id=agent_id,
+                poll_interval=poll_interval,
+                timeout=timeout,
+                log_prefix=log_prefix,
+            )
+        except TimeoutError:
+            raise
+        except HttpResponseError as exc:
+            # Starting the run can itself be throttled with an HTTP 429; retry that like a rate-limited run.
+            if exc.status_code != 429 or attempt >= max_attempts:
+                print(f"{log_prefix}failed to run agent: {exc}", file=sys.stderr)
+                raise
+            run = None
         except Exception as exc:  # pragma: no cover - investigative logging
-            print(f"failed to create run: {exc}", file=sys.stderr)
+            print(f"{log_prefix}failed to run agent: {exc}", file=sys.stderr)
             raise
 
-        deadline = time.time() + timeout
-        last_status: Optional[str] = None
-        last_error: Optional[object] = None
-        retry_requested = False
-        while time.time() < deadline:
-            current_run = agents_client.runs.get(thread_id=thread.id, run_id=run.id)
-            status_value = _normalize_status(getattr(current_run, "status", None))
-            last_status = status_value
-            if status_value:
-                print(f"status: {status_value}")
-            if status_value in TERMINAL_STATUSES:
-                last_error = _serialize_error(getattr(current_run, "last_error", None))
-                if status_value in SUCCESS_STATUSES:
-                    return {
-                        "thread_id": thread.id,
-                        "run_id": run.id,
-                        "status": status_value,
-                        "last_error": last_error,
-                        "succeeded": True,
-                        "project_endpoint": endpoint,
-                    }
-                if _is_retryable_rate_limit(last_error) and attempt < max_attempts:
-                    wait_seconds = min(max_backoff, current_backoff)
-                    print(
-                        f"Run attempt {attempt} failed due to rate limit; retrying after {wait_seconds:.0f}s...",
-                        file=sys.stderr,
-                    )
-                    time.sleep(wait_seconds)
-                    current_backoff = min(max_backoff, current_backoff * 1.5)
-                    retry_requested = True
-                    attempt += 1
-                    break
+        if run is not None:
+            status_value = _normalize_status(getattr(run, "status", None))
+            last_error = _serialize_error(getattr(run, "last_error", None))
+            if status_value in SUCCESS_STATUSES:
+                return {
+                    "thread_id": thread.id,
+                    "run_id": run.id,
+                    "status": status_value,
+                    "last_error": last_error,
+                    "succeeded": True,
+                    "project_endpoint": endpoint,
+                }
+            if not (_is_retryable_rate_limit(last_error) and attempt < max_attempts):
                 return {
                     "thread_id": thread.id,
                     "run_id": run.id,
@@ -160,15 +259,16 @@ def verify_agent(
                     "succeeded": False,
                     "project_endpoint": endpoint,
                 }
-            time.sleep(poll_interval)
-        else:
-            # loop exited without break => timeout
-            raise TimeoutError(
-                f"Timed out waiting for run {run.id} (last status: {last_status or 'unknown'})."
-            )
 
-        if retry_requested:
-            continue
+        # Decorrelated jitter keeps parallel verifications from retrying in lockstep.
+        wait_seconds = min(max_backoff, random.uniform(base_backoff, current_backoff * 3))
+        print(
+            f"{log_prefix}Run attempt {attempt} failed due to rate limit; retrying after {wait_seconds:.0f}s...",
+            file=sys.stderr,
+        )
+        time.sleep(wait_seconds)
+        current_backoff = wait_seconds
+        attempt += 1
 
     raise RuntimeError("Exceeded retry attempts due to repeated rate limiting.")
 
@@ -243,7 +343,8 @@ def main(argv: list[str]) -> int:
     if args.show_transcript:
         print("\n--- Agent transcript ---")
         try:
-            for line in _iter_thread_messages(endpoint=result["project_endpoint"], thread_id=result["thread_id"]):
+            agents_client = get_project_client(result["project_endpoint"]).agents
+            for line in _iter_thread_messages(agents_client=agents_client, thread_id=result["thread_id"]):
                 print(line)
         except Exception as exc:  # pragma: no cover - diagnostic aid
             print(f"failed to read thread transcript: {exc}", file=sys.stderr)
@@ -257,10 +358,9 @@ def main(argv: list[str]) -> int:
     return 0
 
 
-def _iter_thread_messages(*, endpoint: str, thread_id: str) -> Iterable[str]:
-    project_client = AIProjectClient(endpoint=endpoint, credential=DefaultAzureCredential())
-    agents_client = project_client.agents
-    messages = agents_client.messages.list(thread_id=thread_id)
+def _iter_thread_messages(*, agents_client, thread_id: str) -> Iterable[str]:
+    # Page through the thread lazily instead of fetching every message up front.
+    messages = agents_client.messages.list(thread_id=thread_id, limit=MESSAGE_PAGE_SIZE)
     for message in messages:
         role = getattr(message, "role", "unknown")
         parts = []
@@ -1,31 +1,52 @@
 import os
-from fastapi import Body, FastAPI, HTTPException
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from fastapi import Body, FastAPI, HTTPException
+from azure.identity.aio import DefaultAzureCredential
+from azure.ai.projects.aio import AIProjectClient
+from azure.ai.agents.models import AgentThreadCreationOptions, ThreadMessageOptions
 
 endpoint = os.environ["AIFOUNDRY_PROJECT_ENDPOINT"]
 triage_agent_id = os.environ.get("TRIAGE_AGENT_ID")
 
-cred = DefaultAzureCredential()
+# The container app injects AZURE_CLIENT_ID for its user-assigned identity. Without it
+# we are running locally, so skip the managed identity (IMDS) probe entirely.
+managed_identity_client_id = os.environ.get("AZURE_CLIENT_ID")
+cred = DefaultAzureCredential(
+    managed_identity_client_id=managed_identity_client_id,
+    exclude_managed_identity_credential=not managed_identity_client_id,
+)
 project_client = AIProjectClient(endpoint=endpoint, credential=cred)
 agents_client = project_client.agents
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    await project_client.close()
+    await cred.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 @app.get("/")
 def health():
     return {"status": "ok", "endpoint": endpoint, "triage_agent_id": triage_agent_id}
 
 @app.post("/triage")
-def triage(ticket: str = Body(..., embed=True)):
+async def triage(ticket: str = Body(..., embed=True)):
     if not triage_agent_id:
         raise HTTPException(status_code=500, detail="No triage agent configured. Set TRIAGE_AGENT_ID.")
 
     try:
-        thread = agents_client.threads.create()
-        agents_client.threads.messages.create(thread_id=thread.id, role="user", content=ticket)
-        run = agents_client.threads.runs.create(thread_id=thread.id, agent_id=triage_agent_id)
+        # Create the thread, post the ticket and start the run in a single round-trip.
+        run = await agents_client.create_thread_and_run(
+            agent_id=triage_agent_id,
+            thread=AgentThreadCreationOptions(
+                messages=[ThreadMessageOptions(role="user", content=ticket)]
+            ),
+        )
     except Exception as exc:  # broad except to translate SDK failures into HTTP errors
         raise HTTPException(status_code=502, detail=f"Failed to triage ticket: {exc}") from exc
 
-    return {"thread_id": thread.id, "run_id": run.id}
+    return {"thread_id": run.thread_id, "run_id": run.id}